@@ -10,64 +10,105 @@ Fixes Applied:
 
 Usage:
     python apply_v14.2_fixes.py
+    python apply_v14.2_fixes.py [--output-dir DIR] workflow1.json ['*.json' ...]
+
+Without arguments the repo's current workflow is fixed, backed up and saved
+as v14.2. With workflow arguments (glob patterns are expanded) every
+matching file is patched, in parallel across processes when there are
+several: into DIR with --output-dir, otherwise in place after a backup to
+<file>.bak. Files that fail are reported in the summary and make the exit
+status 1.
 """
 
+import argparse
 import json
+import re
+import shutil
 import sys
 from pathlib import Path
+from typing import Optional, Tuple
+
+from workflow_io import (
+    WorkflowPatcher, add_batch_arguments, is_up_to_date, run_file_batch, write_patched,
+)
+
+# Legal suffixes stripped from correspondent names; a trailing '.' on an
+# abbreviation is optional when matching
+LEGAL_SUFFIXES = [
+    'gmbh', 'kg', 'kgaa', 'ag', 'se', 'llc', 'inc', 'corp', 'corporation',
+    'ltd', 'limited', 'plc', 's.a.', 's.r.l.', 's.p.a.',
+    'bv', 'nv', 'oy', 'ab', 'aps', 'as', 'co', 'company', 'rcv',
+    'ohg', 'gbr', 'ev', 'eg', 'ges.m.b.h.', 'stg',
+]
+
+# Known aliases, matched as prefixes of the lowercased, accent-folded name
+ALIASES = {
+    'boehringer ingelheim rcv & co': 'Boehringer Ingelheim',
+    'boehringer ingelheim rcv': 'Boehringer Ingelheim',
+    'magistrat wien-mba f.d. 21. bezirk': 'Magistrat Wien',
+    'magistrat wien': 'Magistrat Wien',
+    'wiener linien gmbh & co': 'Wiener Linien',
+    'magenta telekom': 'Magenta Telekom',
+    'magenta': 'Magenta Telekom',
+}
 
-# Read correspondent normalization code
-NORMALIZATION_CODE = '''
-// ========================================
-// CORRESPONDENT NORMALIZATION FUNCTIONS
-// ========================================
 
-const LEGAL_SUFFIXES = [
-  'gmbh', 'kg', 'kgaa', 'ag', 'se', 'llc', 'inc', 'corp', 'corporation',
-  'ltd', 'limited', 'plc', 's\\\\.a\\\\.?', 's\\\\.r\\\\.l\\\\.?', 's\\\\.p\\\\.a\\\\.?',
-  'bv', 'nv', 'oy', 'ab', 'aps', 'as', 'co', 'company', 'rcv',
-  'ohg', 'gbr', 'ev', 'eg', 'ges\\\\.m\\\\.b\\\\.h\\\\.?', 'stg'
-];
-
-const ALIASES = {
-  'boehringer ingelheim rcv & co': 'Boehringer Ingelheim',
-  'boehringer ingelheim rcv': 'Boehringer Ingelheim',
-  'magistrat wien-mba f.d. 21. bezirk': 'Magistrat Wien',
-  'magistrat wien': 'Magistrat Wien',
-  'wiener linien gmbh & co': 'Wiener Linien',
-  'magenta telekom': 'Magenta Telekom',
-  'magenta': 'Magenta Telekom'
-};
+def _suffix_pattern(suffix: str) -> str:
+    if suffix.endswith('.'):
+        return re.escape(suffix[:-1]) + r'\.?'
+    return re.escape(suffix)
+
 
-function normalizeCorrespondent(name) {
+# Both tables are emitted as ready-made JS literals so the workflow does not
+# rebuild them on every execution. Aliases are ordered longest key first so
+# a short key ('magenta') can never shadow a longer one ('magenta telekom').
+SUFFIX_RE_LITERAL = r'/\b(' + '|'.join(map(_suffix_pattern, LEGAL_SUFFIXES)) + r')\b/gi'
+ALIASES_LITERAL = json.dumps(
+    dict(sorted(ALIASES.items(), key=lambda item: len(item[0]), reverse=True)),
+    indent=2,
+    ensure_ascii=False
+)
+
+# JS bodies are kept as plain literals (they contain { } and regex escapes)
+# and interpolated below, so each generated script is built in one step
+_NORMALIZATION_FUNCTIONS = r'''function normalizeCorrespondent(name) {
   if (!name || typeof name !== 'string') return 'Unknown';
 
-  const lowerName = name.toLowerCase().trim();
+  // Compose to NFC (Unicode UAX #15) so precomposed and decomposed input
+  // compare equal. Only the alias key is folded further (diacritics dropped,
+  // German locale lowercasing): the canonical name keeps its accents, and
+  // generateSlug() folds them for the storage path, so "Forêt" and "Foret"
+  // still share one path.
+  const composed = name.normalize('NFC');
+  const lowerName = composed.normalize('NFD').replace(DIACRITICS_RE, '')
+    .normalize('NFC').toLocaleLowerCase('de-DE').trim();
 
   // Check aliases first
-  for (const [key, value] of Object.entries(ALIASES)) {
+  for (const [key, value] of ALIAS_ENTRIES) {
     if (lowerName.startsWith(key)) {
       console.log('Alias match: "' + name + '" → "' + value + '"');
       return value;
     }
   }
 
-  // Remove punctuation and connectors
-  let n = name.replace(/[.,]/g, ' ')
-              .replace(/\\\\s*&\\\\s*/g, ' ')
-              .replace(/\\\\s+and\\\\s+/gi, ' ')
-              .replace(/\\\\s+/g, ' ')
-              .trim();
+  // Remove punctuation and connectors, collapsing whitespace, in one pass
+  let n = composed.replace(NORMALIZE_RE, ' ').trim();
 
   // Strip legal suffixes
-  const suffixRe = new RegExp('\\\\\\\\b(' + LEGAL_SUFFIXES.join('|') + ')\\\\\\\\b', 'gi');
-  n = n.replace(suffixRe, '').replace(/\\\\s+/g, ' ').trim();
+  n = n.replace(SUFFIX_RE, '').replace(/\s+/g, ' ').trim();
 
   // Remove trailing connectors
-  n = n.replace(/\\\\s*[&+]\\\\s*$/g, '').trim();
-
-  // Title-case
-  n = n.replace(/\\\\b\\\\w/g, c => c.toUpperCase());
+  n = n.replace(/\s*[&+]\s*$/g, '').trim();
+
+  // Title-case in a single forward scan (a word starts after a space or hyphen)
+  let titled = '';
+  let boundary = true;
+  for (let i = 0; i < n.length; i++) {
+    const c = n[i];
+    titled += boundary ? c.toUpperCase() : c;
+    boundary = c === ' ' || c === '-';
+  }
+  n = titled;
 
   console.log('Normalized: "' + name + '" → "' + n + '"');
   return n || 'Unknown';
@@ -76,15 +117,33 @@ function normalizeCorrespondent(name) {
 function generateSlug(name) {
   return name.toLowerCase()
     .normalize('NFD')
-    .replace(/[\\\\u0300-\\\\u036f]/g, '')
+    .replace(DIACRITICS_RE, '')
     .replace(/[^a-z0-9]+/g, '-')
     .replace(/^-+|-+$/g, '')
     .substring(0, 50);
 }
 '''
 
-# Updated "Generate Storage Path" code with normalization
-GENERATE_STORAGE_PATH_CODE = NORMALIZATION_CODE + '''
+NORMALIZATION_CODE = rf'''
+// ========================================
+// CORRESPONDENT NORMALIZATION FUNCTIONS
+// ========================================
+
+// Longest key first (ordered by the generator)
+const ALIASES = {ALIASES_LITERAL};
+const ALIAS_ENTRIES = Object.entries(ALIASES);
+
+// Combining diacritical marks (after NFD decomposition)
+const DIACRITICS_RE = /[\u0300-\u036f]/g;
+// Any run of periods, commas, '&' or whitespace becomes one space, taking at
+// most one following 'and' with it (as the old chained \s+and\s+ replace did,
+// so "a and and b" keeps one 'and')
+const NORMALIZE_RE = /[\s.,&]+(?:and[\s.,&]+)?/gi;
+const SUFFIX_RE = {SUFFIX_RE_LITERAL};
+
+{_NORMALIZATION_FUNCTIONS}'''
+
+_GENERATE_STORAGE_PATH_BODY = '''
 // ========================================
 // GENERATE STORAGE PATH WITH NORMALIZATION
 // ========================================
@@ -116,6 +175,9 @@ return {
 };
 '''
 
+# Updated "Generate Storage Path" code with normalization
+GENERATE_STORAGE_PATH_CODE = f'{NORMALIZATION_CODE}{_GENERATE_STORAGE_PATH_BODY}'
+
 # Updated "Get Storage Path ID" code with retry logic
 GET_STORAGE_PATH_ID_CODE = '''// Extract Storage Path ID from either existing or newly created
 console.log('=== GET STORAGE PATH ID ===');
@@ -127,8 +189,9 @@ const createResult = $input.first().json;
 // CHECK FOR UNIQUE CONSTRAINT ERROR (400 with specific message)
 if (createResult && createResult.statusCode >= 400) {
   const errorMsg = createResult.error || createResult.message || '';
-  const isUniqueConstraint = errorMsg.toLowerCase().includes('unique constraint') ||
-                             errorMsg.toLowerCase().includes('already exists');
+  const errorLower = errorMsg.toLowerCase();
+  const isUniqueConstraint = errorLower.includes('unique constraint') ||
+                             errorLower.includes('already exists');
 
   if (isUniqueConstraint) {
     console.warn('⚠️  UNIQUE CONSTRAINT ERROR - Storage path already exists');
@@ -183,80 +246,196 @@ return {json: {...matchResult, storage_path_id: storagePathId, storage_path_sour
 '''
 
 
-def apply_fixes(workflow_path: Path) -> dict:
-    """Apply all v14.2 fixes to the workflow"""
+# A fix handler's (description, changed) result
+FixResult = Tuple[str, bool]
 
-    print(f"Loading workflow from: {workflow_path}")
-    with open(workflow_path, 'r', encoding='utf-8') as f:
-        workflow = json.load(f)
 
-    nodes = workflow.get('nodes', [])
-    fixes_applied = []
+def _replace_all(text: str, old: str, new: str) -> Optional[str]:
+    """Replace every occurrence of old, or return None if there is none
 
-    # Fix 1: Add pagination to "Check Storage Paths"
-    for node in nodes:
-        if node.get('name') == 'Check Storage Paths':
-            print("[FIX 1] Applying Fix 1: Add pagination to Check Storage Paths")
-            node['parameters']['sendQuery'] = True
-            node['parameters']['queryParameters'] = {
-                'parameters': [
-                    {
-                        'name': 'page_size',
-                        'value': '1000'
-                    }
-                ]
+    str.find locates the first hit, so replace() only has to scan the rest
+    of the string instead of an 'in' check followed by a full rescan.
+    """
+    idx = text.find(old)
+    if idx < 0:
+        return None
+    return text[:idx] + text[idx:].replace(old, new)
+
+
+def _fix_pagination(node: dict) -> FixResult:
+    """Fix 1: Add pagination to "Check Storage Paths" """
+    params = node['parameters']
+    query = {
+        'parameters': [
+            {
+                'name': 'page_size',
+                'value': '1000'
             }
-            fixes_applied.append("Pagination fix (page_size=1000)")
+        ]
+    }
+    changed = params.get('sendQuery') is not True or params.get('queryParameters') != query
+    if changed:
+        print("[FIX 1] Applying Fix 1: Add pagination to Check Storage Paths")
+        params['sendQuery'] = True
+        params['queryParameters'] = query
+    return "Pagination fix (page_size=1000)", changed
+
+
+def _fix_generate(node: dict) -> FixResult:
+    """Fix 2: Update "Generate Storage Path" with normalization"""
+    changed = node['parameters'].get('jsCode') != GENERATE_STORAGE_PATH_CODE
+    if changed:
+        print("[FIX 2] Applying Fix 2: Add correspondent normalization to Generate Storage Path")
+        node['parameters']['jsCode'] = GENERATE_STORAGE_PATH_CODE
+    return "Correspondent normalization", changed
+
+
+def _fix_get_id(node: dict) -> FixResult:
+    """Fix 3: Update "Get Storage Path ID" with retry logic"""
+    changed = node['parameters'].get('jsCode') != GET_STORAGE_PATH_ID_CODE
+    if changed:
+        print("[FIX 3] Applying Fix 3: Add retry logic to Get Storage Path ID")
+        node['parameters']['jsCode'] = GET_STORAGE_PATH_ID_CODE
+    return "Unique constraint error handling", changed
+
+
+def _fix_check_corr(node: dict) -> Optional[FixResult]:
+    """Fix 4: Update "Check Correspondent Exists" to use canonical name"""
+    description = "Correspondent matching uses canonical name"
+    # Update the Code node that searches for correspondent (once: the
+    # replacement still contains data.correspondent_name)
+    current_code = node['parameters'].get('jsCode', '')
+    if 'data.correspondent_canonical' in current_code:
+        return description, False
+    updated_code = _replace_all(
+        current_code,
+        'data.correspondent_name',
+        'data.correspondent_canonical || data.correspondent_name'
+    )
+    if updated_code is None:
+        return None
+    print("[FIX 4] Applying Fix 4: Update Check Correspondent Exists to use canonical name")
+    node['parameters']['jsCode'] = updated_code
+    return description, True
+
+
+def _fix_create_corr(node: dict) -> Optional[FixResult]:
+    """Fix 5: Update "Create Correspondent" to use canonical name"""
+    description = "Correspondent creation uses canonical name"
+    json_body = node['parameters'].get('jsonBody', '')
+    updated_body = _replace_all(
+        json_body,
+        '$json.correspondent_name',
+        '$json.correspondent_canonical'
+    )
+    if updated_body is None:
+        if '$json.correspondent_canonical' in json_body:
+            return description, False
+        return None
+    print("[FIX 5] Applying Fix 5: Update Create Correspondent to use canonical name")
+    node['parameters']['jsonBody'] = updated_body
+    return description, True
+
+
+# Node name -> fix handler; each handler prints a [FIX n] line only when it
+# changes the node, and returns (description, changed), or None if the node
+# does not have the code the fix targets
+FIX_HANDLERS = {
+    'Check Storage Paths': _fix_pagination,
+    'Generate Storage Path': _fix_generate,
+    'Get Storage Path ID': _fix_get_id,
+    'Check Correspondent Exists': _fix_check_corr,
+    'Create Correspondent': _fix_create_corr,
+}
 
-    # Fix 2: Update "Generate Storage Path" with normalization
-    for node in nodes:
-        if node.get('name') == 'Generate Storage Path':
-            print("[FIX 2] Applying Fix 2: Add correspondent normalization to Generate Storage Path")
-            node['parameters']['jsCode'] = GENERATE_STORAGE_PATH_CODE
-            fixes_applied.append("Correspondent normalization")
 
-    # Fix 3: Update "Get Storage Path ID" with retry logic
-    for node in nodes:
-        if node.get('name') == 'Get Storage Path ID':
-            print("[FIX 3] Applying Fix 3: Add retry logic to Get Storage Path ID")
-            node['parameters']['jsCode'] = GET_STORAGE_PATH_ID_CODE
-            fixes_applied.append("Unique constraint error handling")
+def apply_fixes(workflow: dict) -> dict:
+    """Apply all v14.2 fixes to the workflow
 
-    # Fix 4: Update "Check Correspondent Exists" to use canonical name
-    for node in nodes:
-        if node.get('name') == 'Check Correspondent Exists':
-            print("[FIX 4] Applying Fix 4: Update Check Correspondent Exists to use canonical name")
-            # Update the Code node that searches for correspondent
-            current_code = node['parameters'].get('jsCode', '')
-            if 'correspondent_name' in current_code:
-                updated_code = current_code.replace(
-                    'data.correspondent_name',
-                    'data.correspondent_canonical || data.correspondent_name'
-                )
-                node['parameters']['jsCode'] = updated_code
-                fixes_applied.append("Correspondent matching uses canonical name")
-
-    # Fix 5: Update "Create Correspondent" to use canonical name
+    Every fix mutates the loaded workflow in place, so only one copy of the
+    node graph is ever alive; the same dict is returned for convenience.
+    """
+
+    nodes = workflow.get('nodes', [])
+    fixes_applied = []
+    fixes_present = []
+
+    # Index nodes by name once (a list per name, in case of duplicates)
+    nodes_by_name = {}
     for node in nodes:
-        if node.get('name') == 'Create Correspondent':
-            print("[FIX 5] Applying Fix 5: Update Create Correspondent to use canonical name")
-            json_body = node['parameters'].get('jsonBody', '')
-            if 'correspondent_name' in json_body:
-                updated_body = json_body.replace(
-                    '$json.correspondent_name',
-                    '$json.correspondent_canonical'
-                )
-                node['parameters']['jsonBody'] = updated_body
-                fixes_applied.append("Correspondent creation uses canonical name")
+        nodes_by_name.setdefault(node.get('name'), []).append(node)
+
+    for name, handler in FIX_HANDLERS.items():
+        for node in nodes_by_name.get(name, ()):
+            result = handler(node)
+            if result is None:
+                continue
+            description, changed = result
+            (fixes_applied if changed else fixes_present).append(description)
 
     print(f"\n[SUMMARY] Applied {len(fixes_applied)} fixes:")
     for fix in fixes_applied:
         print(f"  - {fix}")
+    if fixes_present:
+        print(f"[SUMMARY] {len(fixes_present)} fixes already present:")
+        for fix in fixes_present:
+            print(f"  - {fix}")
 
     return workflow
 
 
+def _fix_workflow(path) -> bytes:
+    """Load a workflow, apply the v14.2 fixes and return the serialized result"""
+    # The patcher checks that apply_fixes mutates the workflow in place
+    patcher = WorkflowPatcher(path).apply(apply_fixes)
+    fixed_workflow = patcher.workflow
+
+    # Update version info
+    fixed_workflow['name'] = 'Paperless AI Processing v14.2'
+    fixed_workflow['meta'] = fixed_workflow.get('meta', {})
+    fixed_workflow['meta']['version'] = '14.2'
+
+    return patcher.dumps()
+
+
+def apply_fixes_one_file(src, dst=None) -> Tuple[str, str]:
+    """Apply the v14.2 fixes to the workflow at src and write it to dst
+
+    Without dst the file is patched in place, after the original is copied
+    to <src>.bak. Errors are reported here instead of raised, so one bad
+    file does not stop a batch.
+
+    Returns (status, detail): status is 'updated', 'unchanged' (dst already
+    had the fixes) or 'failed', with the error message as detail.
+    """
+    print(f"\n[FIXING] {src}")
+    try:
+        data = _fix_workflow(src)
+        written = write_patched(src, src if dst is None else dst, data)
+    except (LookupError, OSError, ValueError) as e:
+        # LookupError also covers a KeyError from a malformed workflow, and
+        # ValueError a JSON decode error
+        print(f"[ERROR] {src}: {e}")
+        return 'failed', str(e)
+    return ('updated' if written else 'unchanged'), ''
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Apply the v14.2 fixes to workflows")
+    add_batch_arguments(parser, default="the repo's current workflow")
+    return parser.parse_args()
+
+
 def main():
+    args = _parse_args()
+    if args.workflows:
+        if not run_file_batch(apply_fixes_one_file, args.workflows, args.output_dir):
+            sys.exit(1)
+        return
+    if args.output_dir is not None:
+        print("[ERROR] --output-dir needs workflow files to patch")
+        sys.exit(1)
+
     # Paths
     repo_root = Path(__file__).parent.parent.parent
     current_workflow = repo_root / 'workflows' / 'current' / 'paperless-ai-automation.json'
@@ -267,32 +446,32 @@ def main():
         print(f"[ERROR] Workflow not found at {current_workflow}")
         sys.exit(1)
 
-    # Backup current workflow
-    print(f"\n[BACKUP] Backing up current workflow to: {backup_workflow}")
-    backup_workflow.parent.mkdir(parents=True, exist_ok=True)
-    with open(current_workflow, 'r', encoding='utf-8') as f:
-        backup_data = f.read()
-    with open(backup_workflow, 'w', encoding='utf-8') as f:
-        f.write(backup_data)
-
     # Apply fixes
     print("\n[FIXING] Applying v14.2 fixes...")
-    fixed_workflow = apply_fixes(current_workflow)
-
-    # Update version info
-    fixed_workflow['name'] = 'Paperless AI Processing v14.2'
-    fixed_workflow['meta'] = fixed_workflow.get('meta', {})
-    fixed_workflow['meta']['version'] = '14.2'
-
-    # Save fixed workflow
+    print(f"Loading workflow from: {current_workflow}")
+    data = _fix_workflow(current_workflow)
+
+    # Skip all writes when a previous run already produced this output
+    current_up_to_date = is_up_to_date(current_workflow, data)
+    if current_up_to_date and is_up_to_date(output_workflow, data):
+        print("\n[SKIP] Workflow already has the v14.2 fixes, nothing to write")
+        return
+
+    # Backup current workflow (not when it already is v14.2, which would
+    # overwrite the real v14.1 backup)
+    if not current_up_to_date:
+        print(f"\n[BACKUP] Backing up current workflow to: {backup_workflow}")
+        backup_workflow.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(current_workflow, backup_workflow)
+
+    # Save fixed workflow (serialized once, then copied)
     print(f"\n[SAVE] Saving fixed workflow to: {output_workflow}")
-    with open(output_workflow, 'w', encoding='utf-8') as f:
-        json.dump(fixed_workflow, f, indent=2)
+    output_workflow.write_bytes(data)
 
     # Also update the current workflow
-    print(f"[SAVE] Updating current workflow: {current_workflow}")
-    with open(current_workflow, 'w', encoding='utf-8') as f:
-        json.dump(fixed_workflow, f, indent=2)
+    if not current_up_to_date:
+        print(f"[SAVE] Updating current workflow: {current_workflow}")
+        shutil.copyfile(output_workflow, current_workflow)
 
     print("\n" + "="*60)
     print("[SUCCESS] v14.2 FIXES APPLIED SUCCESSFULLY")
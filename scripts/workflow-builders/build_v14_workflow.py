@@ -6,27 +6,34 @@ Build v14 workflow with entity-based architecture
 - Updates document update payload to use entity IDs
 """
 
-import json
+import re
 import sys
+from pathlib import Path
 
-print("[INFO] Building v14 workflow from v13.1...")
+from workflow_io import WorkflowPatcher
 
-# Read v13.1 workflow
-with open('paperless_workflow-v13.1-fixed.json', 'r', encoding='utf-8') as f:
-    workflow = json.load(f)
 
-print(f"[INFO] Loaded v13.1 workflow: {len(workflow['nodes'])} nodes")
+def build_v14(workflow: dict) -> dict:
+    """Apply the v14 entity-based changes to a v13.1 workflow in place
 
-# === STEP 1: Update Consolidated Processor ===
-print("\n[STEP 1] Updating Consolidated Processor...")
+    Raises LookupError if a required node is missing.
+    """
 
-for node in workflow['nodes']:
-    if node.get('name') == 'Consolidated Processor':
-        print(f"  Found node: {node['id']}")
-        js_code = node['parameters']['jsCode']
+    # Index nodes by name once instead of scanning the list for every lookup
+    nodes_by_name = {node.get('name'): node for node in workflow['nodes']}
+
+    # === STEP 1: Update Consolidated Processor ===
+    print("\n[STEP 1] Updating Consolidated Processor...")
+
+    node = nodes_by_name.get('Consolidated Processor')
+    if node is None:
+        raise LookupError("Could not find Consolidated Processor node")
+
+    print(f"  Found node: {node['id']}")
+    js_code = node['parameters']['jsCode']
 
-        # Remove STORAGE_PATH from FIELD_IDS
-        old_field_ids = """const FIELD_IDS = {
+    # Remove STORAGE_PATH from FIELD_IDS
+    old_field_ids = """const FIELD_IDS = {
     STORAGE_PATH: 33,
     SLA_DEADLINE: 34,
     OBLIGATION_TYPE: 35,
@@ -35,7 +42,7 @@ for node in workflow['nodes']:
     MONITORING_STATUS: 38
   };"""
 
-        new_field_ids = """const FIELD_IDS = {
+    new_field_ids = """const FIELD_IDS = {
     SLA_DEADLINE: 34,
     OBLIGATION_TYPE: 35,
     RISK_LEVEL: 36,
@@ -43,32 +50,19 @@ for node in workflow['nodes']:
     MONITORING_STATUS: 38
   };"""
 
-        if old_field_ids in js_code:
-            js_code = js_code.replace(old_field_ids, new_field_ids)
-            print("  [OK] Removed STORAGE_PATH from FIELD_IDS")
-        else:
-            print("  [WARN] Could not find exact FIELD_IDS pattern")
-
-        # Remove storage path from enhanced fields array
-        # Find and remove the line: {field: FIELD_IDS.STORAGE_PATH, value: storagePath}
-        lines_to_remove = [
-            '{field: FIELD_IDS.STORAGE_PATH, value: storagePath}',
-            '{field: FIELD_IDS.STORAGE_PATH, value: OPTION_ID_MAPS.STORAGE_PATH[storagePath] || storagePath}'
-        ]
-
-        for line in lines_to_remove:
-            if line in js_code:
-                # Remove the line and the comma before it
-                js_code = js_code.replace(f',\n      {line}', '')
-                js_code = js_code.replace(f'{line},', '')
-                print(f"  [OK] Removed storage path field assignment")
+    # Remove storage path from enhanced fields array
+    # Find and remove the line: {field: FIELD_IDS.STORAGE_PATH, value: storagePath}
+    lines_to_remove = [
+        '{field: FIELD_IDS.STORAGE_PATH, value: storagePath}',
+        '{field: FIELD_IDS.STORAGE_PATH, value: OPTION_ID_MAPS.STORAGE_PATH[storagePath] || storagePath}'
+    ]
 
-        # Add entity data output for Entity Manager
-        # Find the enhanced classification section and fix variable scoping
-        # Need to move entity data prep INSIDE the try-catch block
+    # Add entity data output for Entity Manager
+    # Find the enhanced classification section and fix variable scoping
+    # Need to move entity data prep INSIDE the try-catch block
 
-        # First, find and replace the classification section ending
-        old_classification_end = """  console.log('✅ Enhanced classification completed');
+    # First, find and replace the classification section ending
+    old_classification_end = """  console.log('✅ Enhanced classification completed');
   console.log(`📂 Storage Path: ${storagePath}`);
   console.log(`⚠️  Risk Level: ${riskLevel}`);
   console.log(`📋 Obligation Type: ${obligationType}`);
@@ -82,7 +76,7 @@ for node in workflow['nodes']:
   result.processing_summary.processing_errors.push(`Enhanced Classification: ${error.message}`);
 }"""
 
-        new_classification_end = """  console.log('✅ Enhanced classification completed');
+    new_classification_end = """  console.log('✅ Enhanced classification completed');
   console.log(`📂 Storage Path: ${storagePath}`);
   console.log(`⚠️  Risk Level: ${riskLevel}`);
   console.log(`📋 Obligation Type: ${obligationType}`);
@@ -122,64 +116,86 @@ for node in workflow['nodes']:
   result.storage_path_template = 'reference-documents/unknown';
 }"""
 
-        if old_classification_end in js_code:
-            js_code = js_code.replace(old_classification_end, new_classification_end)
-            print("  [OK] Moved entity data prep inside try-catch block")
-        else:
-            print("  [WARN] Could not find classification end pattern")
-
-        # Remove the old standalone return statement (will be added back at the end)
-        enhanced_section = """
+    # Remove the old standalone return statement (will be added back at the end)
+    enhanced_section = """
   return { json: result };"""
 
-        js_code = js_code.replace('return { json: result };', enhanced_section)
-        print("  [OK] Added storage_category output")
-
+    # Every patch as exact snippet -> replacement
+    replacements = {
+        old_field_ids: new_field_ids,
+        old_classification_end: new_classification_end,
+        'return { json: result };': enhanced_section,
         # Update version
-        js_code = js_code.replace(
-            'v13.1-fixed-select-fields',
-            'v14-entity-based-architecture'
-        )
-
-        node['parameters']['jsCode'] = js_code
-        print("  [OK] Consolidated Processor updated")
-        break
-else:
-    print("[ERROR] Could not find Consolidated Processor node")
-    sys.exit(1)
-
-# === STEP 2: Add Entity Manager Node ===
-print("\n[STEP 2] Adding Entity Manager node...")
-
-# Read the entity manager code
-with open('entity_manager_node.js', 'r', encoding='utf-8') as f:
-    entity_manager_code = f.read()
-
-# Find the highest node position to place new node
-max_y = max(node['position'][1] for node in workflow['nodes'])
-
-# Create Entity Manager node
-entity_manager_node = {
-    "parameters": {
-        "jsCode": entity_manager_code
-    },
-    "id": "entity-manager-v14",
-    "name": "Entity Manager",
-    "type": "n8n-nodes-base.code",
-    "typeVersion": 2,
-    "position": [
-        1200,
-        max_y + 200
-    ]
-}
+        'v13.1-fixed-select-fields': 'v14-entity-based-architecture',
+    }
+    for line in lines_to_remove:
+        # Remove the line and the comma before (or after) it
+        replacements[f',\n      {line}'] = ''
+        replacements[f'{line},'] = ''
+
+    # Apply all patches in a single pass over js_code (longest snippets first,
+    # so the alternation prefers a full match over a shorter overlapping one)
+    patch_re = re.compile('|'.join(
+        re.escape(snippet) for snippet in sorted(replacements, key=len, reverse=True)
+    ))
+    applied = set()
+
+    def _apply_patch(match):
+        applied.add(match.group(0))
+        return replacements[match.group(0)]
+
+    js_code = patch_re.sub(_apply_patch, js_code)
+
+    if old_field_ids in applied:
+        print("  [OK] Removed STORAGE_PATH from FIELD_IDS")
+    else:
+        print("  [WARN] Could not find exact FIELD_IDS pattern")
+
+    for line in lines_to_remove:
+        if f',\n      {line}' in applied or f'{line},' in applied:
+            print(f"  [OK] Removed storage path field assignment")
+
+    if old_classification_end in applied:
+        print("  [OK] Moved entity data prep inside try-catch block")
+    else:
+        print("  [WARN] Could not find classification end pattern")
+
+    print("  [OK] Added storage_category output")
+
+    node['parameters']['jsCode'] = js_code
+    print("  [OK] Consolidated Processor updated")
+
+    # === STEP 2: Add Entity Manager Node ===
+    print("\n[STEP 2] Adding Entity Manager node...")
+
+    # Read the entity manager code
+    entity_manager_code = Path('entity_manager_node.js').read_text(encoding='utf-8')
+
+    # Find the highest node position to place new node
+    max_y = max(node['position'][1] for node in workflow['nodes'])
+
+    # Create Entity Manager node
+    entity_manager_node = {
+        "parameters": {
+            "jsCode": entity_manager_code
+        },
+        "id": "entity-manager-v14",
+        "name": "Entity Manager",
+        "type": "n8n-nodes-base.code",
+        "typeVersion": 2,
+        "position": [
+            1200,
+            max_y + 200
+        ]
+    }
 
-workflow['nodes'].append(entity_manager_node)
-print(f"  [OK] Entity Manager node added (ID: entity-manager-v14)")
+    workflow['nodes'].append(entity_manager_node)
+    print(f"  [OK] Entity Manager node added (ID: entity-manager-v14)")
 
-# === STEP 2.5: Add Build Update Payload Node ===
-print("\n[STEP 2.5] Adding Build Update Payload node...")
+    # === STEP 2.5: Add Build Update Payload Node ===
+    print("\n[STEP 2.5] Adding Build Update Payload node...")
 
-build_payload_code = """const entityData = $input.first().json;
+    build_payload_code = """const entityData = $input.first().json;
 const classification = entityData.classification || {};
 
 const mergedPayload = {
@@ -208,57 +224,50 @@ return {
   }
 };"""
 
-build_payload_node = {
-    "parameters": {
-        "jsCode": build_payload_code
-    },
-    "id": "build-update-payload-v14",
-    "name": "Build Update Payload",
-    "type": "n8n-nodes-base.code",
-    "typeVersion": 2,
-    "position": [
-        -1000,
-        192
-    ]
-}
-
-workflow['nodes'].append(build_payload_node)
-print(f"  [OK] Build Update Payload node added (ID: build-update-payload-v14)")
+    build_payload_node = {
+        "parameters": {
+            "jsCode": build_payload_code
+        },
+        "id": "build-update-payload-v14",
+        "name": "Build Update Payload",
+        "type": "n8n-nodes-base.code",
+        "typeVersion": 2,
+        "position": [
+            -1000,
+            192
+        ]
+    }
 
-# === STEP 3: Update connections ===
-print("\n[STEP 3] Updating node connections...")
+    workflow['nodes'].append(build_payload_node)
+    print(f"  [OK] Build Update Payload node added (ID: build-update-payload-v14)")
 
-# Find Consolidated Processor output connections
-# Need to insert Entity Manager between Consolidated Processor and Check if Updates Needed
-consolidated_processor_id = None
-check_updates_id = None
+    # === STEP 3: Update connections ===
+    print("\n[STEP 3] Updating node connections...")
 
-for node in workflow['nodes']:
-    if node.get('name') == 'Consolidated Processor':
-        consolidated_processor_id = node['id']
-    elif node.get('name') == 'Check if Updates Needed':
-        check_updates_id = node['id']
+    # Find Consolidated Processor output connections
+    # Need to insert Entity Manager between Consolidated Processor and Check if Updates Needed
+    consolidated_processor_id = nodes_by_name.get('Consolidated Processor', {}).get('id')
+    check_updates_id = nodes_by_name.get('Check if Updates Needed', {}).get('id')
 
-if not consolidated_processor_id or not check_updates_id:
-    print("[ERROR] Could not find required nodes for connection update")
-    sys.exit(1)
+    if not consolidated_processor_id or not check_updates_id:
+        raise LookupError("Could not find required nodes for connection update")
 
-print(f"  Found Consolidated Processor: {consolidated_processor_id}")
-print(f"  Found Check if Updates Needed: {check_updates_id}")
+    print(f"  Found Consolidated Processor: {consolidated_processor_id}")
+    print(f"  Found Check if Updates Needed: {check_updates_id}")
 
-# Update connections in workflow
-# This is complex - connections in n8n are defined in the workflow's 'connections' object
-# For now, document that this needs to be done manually in n8n UI
+    # Update connections in workflow
+    # This is complex - connections in n8n are defined in the workflow's 'connections' object
+    # For now, document that this needs to be done manually in n8n UI
 
-print("  [WARN] Connections must be updated manually in n8n:")
-print("    1. Consolidated Processor -> Entity Manager")
-print("    2. Entity Manager -> Check if Updates Needed")
+    print("  [WARN] Connections must be updated manually in n8n:")
+    print("    1. Consolidated Processor -> Entity Manager")
+    print("    2. Entity Manager -> Check if Updates Needed")
 
-# === STEP 4: Update Document Update node ===
-print("\n[STEP 4] Updating Update Document node...")
+    # === STEP 4: Update Document Update node ===
+    print("\n[STEP 4] Updating Update Document node...")
 
-for node in workflow['nodes']:
-    if node.get('name') == 'Update Document':
+    node = nodes_by_name.get('Update Document')
+    if node is not None:
         print(f"  Found node: {node['id']}")
 
         # The Update Document node uses HTTP Request
@@ -271,36 +280,55 @@ for node in workflow['nodes']:
         print("    Add: correspondent: {{ $json.correspondent_id }}")
         print("    Add: document_type: {{ $json.document_type_id }}")
         print("    Add: tags: {{ $json.tag_ids }}")
-        break
-
-# === STEP 5: Update workflow metadata ===
-print("\n[STEP 5] Updating workflow metadata...")
-
-workflow['name'] = 'Paperless AI Processing v14 (Entity-Based)'
-print(f"  [OK] Workflow name: {workflow['name']}")
-
-# === STEP 6: Save v14 workflow ===
-output_file = 'paperless_workflow-v14-entity-based.json'
-with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(workflow, f, indent=2)
-
-print(f"\n[SUCCESS] v14 workflow saved to: {output_file}")
-print(f"[INFO] Workflow nodes: {len(workflow['nodes'])}")
-print(f"[INFO] Workflow name: {workflow['name']}")
-
-print("\n=== MANUAL STEPS REQUIRED ===")
-print("1. Import paperless_workflow-v14-entity-based.json to n8n")
-print("2. Delete redundant nodes:")
-print("   - 'Fetch Available Tags'")
-print("   - 'Map Tag Names to IDs'")
-print("3. Update connections:")
-print("   - Consolidated Processor -> Entity Manager")
-print("   - Entity Manager -> Build Update Payload")
-print("   - Build Update Payload -> Check if Updates Needed")
-print("4. Test with sample document")
-print("5. Verify files organized on disk")
-
-print("\n=== FILES ===")
-print("- [OK] paperless_workflow-v14-entity-based.json (CREATED)")
-print("- [OK] entity_manager_node.js (REFERENCE)")
-print("- [SKIP] paperless_workflow-v13.1-fixed.json (DO NOT USE - has architectural flaws)")
+
+    # === STEP 5: Update workflow metadata ===
+    print("\n[STEP 5] Updating workflow metadata...")
+
+    workflow['name'] = 'Paperless AI Processing v14 (Entity-Based)'
+    print(f"  [OK] Workflow name: {workflow['name']}")
+
+    return workflow
+
+
+def main():
+    print("[INFO] Building v14 workflow from v13.1...")
+
+    # Read v13.1 workflow
+    patcher = WorkflowPatcher('paperless_workflow-v13.1-fixed.json')
+
+    print(f"[INFO] Loaded v13.1 workflow: {len(patcher.workflow['nodes'])} nodes")
+
+    try:
+        patcher.apply(build_v14)
+    except LookupError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    # === STEP 6: Save v14 workflow ===
+    output_file = 'paperless_workflow-v14-entity-based.json'
+    patcher.save(output_file)
+
+    print(f"\n[SUCCESS] v14 workflow saved to: {output_file}")
+    print(f"[INFO] Workflow nodes: {len(patcher.workflow['nodes'])}")
+    print(f"[INFO] Workflow name: {patcher.workflow['name']}")
+
+    print("\n=== MANUAL STEPS REQUIRED ===")
+    print("1. Import paperless_workflow-v14-entity-based.json to n8n")
+    print("2. Delete redundant nodes:")
+    print("   - 'Fetch Available Tags'")
+    print("   - 'Map Tag Names to IDs'")
+    print("3. Update connections:")
+    print("   - Consolidated Processor -> Entity Manager")
+    print("   - Entity Manager -> Build Update Payload")
+    print("   - Build Update Payload -> Check if Updates Needed")
+    print("4. Test with sample document")
+    print("5. Verify files organized on disk")
+
+    print("\n=== FILES ===")
+    print("- [OK] paperless_workflow-v14-entity-based.json (CREATED)")
+    print("- [OK] entity_manager_node.js (REFERENCE)")
+    print("- [SKIP] paperless_workflow-v13.1-fixed.json (DO NOT USE - has architectural flaws)")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,150 +3,41 @@
 Fix BOTH Process AI Results and Consolidated Processor nodes
 Process AI Results: Add correspondent extraction and better JSON parsing
 Consolidated Processor: Keep original classification logic, just update correspondent extraction
+
+Writes compact JSON with minified node code; pass --pretty for a 2-space
+indented file with the node code as written in src/.
 """
-import json
 import sys
 
+from workflow_io import dump_workflow, find_node, load_node_code, load_workflow
+
+# Correspondent extraction line in the v14 Consolidated Processor code
+_CORR_LINE = "const correspondentName = processingData.document_analysis?.category || 'unknown';"
+
+PRETTY = '--pretty' in sys.argv
+
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
 print("[INFO] Loading workflow...")
-with open('paperless_workflow-v14.1-correspondent-fix.json', 'r', encoding='utf-8') as f:
-    workflow = json.load(f)
+workflow = load_workflow('paperless_workflow-v14.1-correspondent-fix.json')
 
 print(f"[OK] Loaded: {len(workflow['nodes'])} nodes")
 
+# Index nodes by name once instead of scanning the list for every lookup
+nodes_by_name = {node.get('name'): node for node in workflow['nodes']}
+
 # === FIX 1: PROCESS AI RESULTS NODE ===
 print("\n[STEP 1] Finding Process AI Results node...")
 
-process_ai_node = None
-for node in workflow['nodes']:
-    if node.get('name') == 'Process AI Results':
-        process_ai_node = node
-        print(f"[OK] Found Process AI Results node")
-        break
-
-if not process_ai_node:
+process_ai_node = nodes_by_name.get('Process AI Results')
+if process_ai_node is None:
     print("[ERROR] Could not find Process AI Results node!")
     sys.exit(1)
+print(f"[OK] Found Process AI Results node")
 
-# Fixed Process AI Results code with correspondent extraction
-process_ai_code = '''// Consolidated AI Results Processor - Handles all processing in one node
-console.log('=== CONSOLIDATED AI RESULTS PROCESSOR ===');
-const startTime = Date.now();
-
-let aiResults = {};
-let processingErrors = [];
-
-try {
-  const input = $input.first();
-  if (!input || !input.json) {
-    throw new Error('No input data received');
-  }
-
-  console.log('Input structure - Keys:', Object.keys(input.json));
-
-  // Capture document_id from input (single extraction)
-  const documentId = input.json.document_id || null;
-  console.log('Document ID:', documentId);
-
-  // Extract AI response from "output" field
-  let aiResponseText = input.json.output || input.json;
-  console.log('Content type:', typeof aiResponseText);
-
-  // Parse the AI response
-  let parsedResults;
-
-  if (typeof aiResponseText === 'object') {
-    parsedResults = aiResponseText;
-  } else if (typeof aiResponseText === 'string') {
-    console.log('Raw AI response (first 200 chars):', aiResponseText.substring(0, 200));
-
-    // Remove markdown code blocks
-    let jsonText = aiResponseText
-      .replace(/```json\\n?/g, '')
-      .replace(/```\\n?/g, '')
-      .trim();
-
-    // Extract JSON from text - find everything between first { and last }
-    const firstBrace = jsonText.indexOf('{');
-    const lastBrace = jsonText.lastIndexOf('}');
-
-    if (firstBrace !== -1 && lastBrace !== -1 && lastBrace > firstBrace) {
-      jsonText = jsonText.substring(firstBrace, lastBrace + 1);
-      console.log('✅ Extracted JSON from text (first 100 chars):', jsonText.substring(0, 100));
-    }
-
-    parsedResults = JSON.parse(jsonText);
-    console.log('✅ Parsed successfully');
-  }
-
-  aiResults = parsedResults;
-
-} catch (error) {
-  console.error('Error:', error.message);
-  processingErrors.push(`Parsing error: ${error.message}`);
-  aiResults = {
-    correspondent: { name: 'Unknown', confidence: 0, note: '' },
-    document_analysis: { confidence: 0.1, category: 'unknown', summary: 'Parsing failed' },
-    document_type: { recommended_id: null, confidence: 0, create_new: false },
-    custom_fields: { field_updates: {}, confidence: 0 },
-    tags: { existing_tag_names: [], new_tags_needed: [], confidence: 0 }
-  };
-}
-
-// Get document_id from input
-const input = $input.first();
-const documentId = input?.json?.document_id || null;
-
-// Build final sanitized structure
-const sanitizedResults = {
-  document_id: documentId,
-
-  correspondent: {
-    name: String(aiResults.correspondent?.name || 'Unknown'),
-    confidence: Number(aiResults.correspondent?.confidence) || 0,
-    note: String(aiResults.correspondent?.note || '')
-  },
-
-  document_analysis: {
-    confidence: Number(aiResults.document_analysis?.confidence) || 0.5,
-    category: String(aiResults.document_analysis?.category || 'unknown'),
-    summary: String(aiResults.document_analysis?.summary || 'Analysis completed')
-  },
-
-  document_type: {
-    recommended_id: aiResults.document_type?.recommended_id || null,
-    recommended_name: String(aiResults.document_type?.recommended_name || ''),
-    confidence: Number(aiResults.document_type?.confidence) || 0,
-    create_new: Boolean(aiResults.document_type?.create_new),
-    new_type_suggestion: aiResults.document_type?.new_type_suggestion || null
-  },
-
-  custom_fields: {
-    field_updates: aiResults.custom_fields?.field_updates || {},
-    confidence: Number(aiResults.custom_fields?.confidence) || 0,
-    new_fields_needed: aiResults.custom_fields?.new_fields_needed || []
-  },
-
-  tags: {
-    existing_tag_names: aiResults.tags?.existing_tag_names || [],
-    new_tags_needed: aiResults.tags?.new_tags_needed || [],
-    confidence: Number(aiResults.tags?.confidence) || 0
-  },
-
-  processing_notes: String(aiResults.processing_notes || 'Processing completed'),
-  processing_errors: processingErrors,
-  processing_timestamp: new Date().toISOString(),
-  processing_duration_ms: Date.now() - startTime
-};
-
-console.log('=== PARSING COMPLETE ===');
-console.log(`Document ID: ${documentId}`);
-console.log(`Correspondent: ${sanitizedResults.correspondent.name} (confidence: ${sanitizedResults.correspondent.confidence})`);
-console.log(`Duration: ${sanitizedResults.processing_duration_ms}ms`);
-
-return { json: sanitizedResults };'''
+# Fixed Process AI Results code with correspondent extraction (src/)
+process_ai_code = load_node_code('process_ai_results_node.js', minify=not PRETTY)
 
 process_ai_node['parameters']['jsCode'] = process_ai_code
 print("[OK] Updated Process AI Results node")
@@ -154,16 +45,11 @@ print("[OK] Updated Process AI Results node")
 # === FIX 2: CONSOLIDATED PROCESSOR NODE ===
 print("\n[STEP 2] Finding Consolidated Processor node...")
 
-consolidated_node = None
-for node in workflow['nodes']:
-    if node.get('name') == 'Consolidated Processor':
-        consolidated_node = node
-        print(f"[OK] Found Consolidated Processor node")
-        break
-
-if not consolidated_node:
+consolidated_node = nodes_by_name.get('Consolidated Processor')
+if consolidated_node is None:
     print("[ERROR] Could not find Consolidated Processor node!")
     sys.exit(1)
+print(f"[OK] Found Consolidated Processor node")
 
 # Check if it has the wrong code (parsing code instead of classification code)
 current_code = consolidated_node['parameters']['jsCode']
@@ -174,16 +60,8 @@ if '=== CONSOLIDATED AI RESULTS PROCESSOR ===' in current_code:
 # We need to use the original v14 Consolidated Processor code
 # Load it from the v14 workflow
 print("[INFO] Loading original Consolidated Processor code from v14 workflow...")
-with open('paperless_workflow-v14-entity-based.json', 'r', encoding='utf-8') as f:
-    v14_workflow = json.load(f)
-
-v14_consolidated = None
-for node in v14_workflow['nodes']:
-    if node.get('name') == 'Consolidated Processor':
-        v14_consolidated = node
-        break
-
-if not v14_consolidated:
+v14_consolidated = find_node('paperless_workflow-v14-entity-based.json', 'Consolidated Processor')
+if v14_consolidated is None:
     print("[ERROR] Could not find Consolidated Processor in v14 workflow!")
     sys.exit(1)
 
@@ -191,10 +69,6 @@ if not v14_consolidated:
 original_code = v14_consolidated['parameters']['jsCode']
 
 # Replace the correspondent extraction section
-import re
-
-old_pattern = r"const correspondentName = processingData\.document_analysis\?\.category \|\| 'unknown';"
-
 new_correspondent_extraction = '''// ===== UPDATED CORRESPONDENT EXTRACTION =====
   // Priority:
   // 1. Use AI-extracted correspondent.name if available and confidence > 0.6
@@ -217,16 +91,17 @@ new_correspondent_extraction = '''// ===== UPDATED CORRESPONDENT EXTRACTION ====
   }
 
   // Validate correspondent is not a document type
-  const commonDocTypes = ['invoice', 'letter', 'contract', 'receipt', 'statement', 'document'];
-  if (commonDocTypes.includes(correspondentName.toLowerCase())) {
+  const DOC_TYPES = new Set(['invoice', 'letter', 'contract', 'receipt', 'statement', 'document']);
+  if (DOC_TYPES.has(correspondentName.toLowerCase())) {
     console.error(`❌ INVALID CORRESPONDENT: "${correspondentName}" is a document type, not a sender!`);
     console.error('   Setting correspondent to "Unknown" - please fix AI extraction');
     correspondentName = 'Unknown';
   }'''
 
-if re.search(old_pattern, original_code):
-    updated_code = re.sub(old_pattern, new_correspondent_extraction, original_code)
-    consolidated_node['parameters']['jsCode'] = updated_code
+# The line is a fixed string, so split around it instead of using a regex
+before, found, after = original_code.partition(_CORR_LINE)
+if found:
+    consolidated_node['parameters']['jsCode'] = before + new_correspondent_extraction + after
     print("[OK] Updated Consolidated Processor with correspondent extraction fix")
 else:
     print("[WARNING] Could not find correspondent extraction pattern to replace")
@@ -235,8 +110,7 @@ else:
 
 # === SAVE UPDATED WORKFLOW ===
 output_file = 'paperless_workflow-v14.1-both-nodes-fixed.json'
-with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(workflow, f, indent=2, ensure_ascii=False)
+dump_workflow(workflow, output_file, pretty=PRETTY)
 
 print(f"\n✅ SUCCESS! Saved to: {output_file}")
 print("\n[SUMMARY]")
@@ -2,203 +2,51 @@
 """
 Fix Correspondent Extraction in v14.1 Workflow
 Updates AI prompt and Consolidated Processor to properly extract correspondent
+
+apply_fix() patches an already loaded workflow in place, so callers holding
+several workflows in memory can reuse it without any workflow file I/O (the
+AI prompt code is read from src/ once, on first use); it raises LookupError
+instead of exiting when a workflow lacks the target code. main()
+reads and writes the v14.1 workflow files. Re-running is safe: code that already
+has the new extraction is left alone, and an output file that already holds
+the result is not rewritten.
+
+Writes compact JSON with minified node code; pass --pretty for a 2-space
+indented file with the node code as written in src/.
+
+Usage:
+    python fix_correspondent_extraction.py [--pretty] [--output-dir DIR]
+    python fix_correspondent_extraction.py [--pretty] [--output-dir DIR] workflow.json ['*.json' ...]
+
+With workflow arguments (glob patterns are expanded) every matching file is
+patched, in parallel across processes when there are several: into DIR with
+--output-dir, otherwise in place after a backup to <file>.bak. Files that
+fail are reported in the summary and make the exit status 1.
 """
-import json
+import argparse
 import sys
-import re
-
-if sys.platform == 'win32':
-    sys.stdout.reconfigure(encoding='utf-8')
-
-print("[INFO] Loading v14.1 workflow...")
-with open('paperless_workflow-v14.1-http-nodes.json', 'r', encoding='utf-8') as f:
-    workflow = json.load(f)
-
-print(f"[OK] Loaded: {len(workflow['nodes'])} nodes")
-
-# === FIND AND UPDATE AI PROMPT PREPARATION NODE ===
-print("\n[STEP 1] Finding AI Prompt Preparation node...")
-
-ai_prompt_node = None
-for node in workflow['nodes']:
-    # Look for node that builds ai_prompt
-    if node.get('type') == 'n8n-nodes-base.code':
-        code = node.get('parameters', {}).get('jsCode', '')
-        if 'ai_prompt' in code and 'OUTPUT REQUIREMENTS' in code:
-            ai_prompt_node = node
-            print(f"[OK] Found AI Prompt Preparation node: '{node['name']}'")
-            break
-
-if not ai_prompt_node:
-    print("[ERROR] Could not find AI Prompt Preparation node!")
-    print("Looking for a Code node with 'ai_prompt' and 'OUTPUT REQUIREMENTS' in the code")
-    sys.exit(1)
-
-# Updated AI Prompt Preparation code
-new_ai_prompt_code = '''// Enhanced AI Prompt with Error Handling + CORRESPONDENT EXTRACTION
-const inputItems = $input.all();
-let documentData = null;
-let customFieldsData = [];
-
-// Find document data with fallbacks
-try {
-  documentData = inputItems.find(item => item.json && (item.json.content || item.json.title));
-  if (!documentData) {
-    throw new Error('No document data found in inputs');
-  }
-} catch (error) {
-  console.error('Document data error:', error.message);
-  // Create minimal fallback structure
-  documentData = {
-    json: {
-      id: 'unknown',
-      title: 'Unknown Document',
-      content: '',
-      correspondent: 'Unknown',
-      document_type: 'Unknown'
-    }
-  };
-}
-
-// Find custom fields data with fallbacks
-try {
-  const customFieldsItem = inputItems.find(item => item.json && (Array.isArray(item.json.results) || Array.isArray(item.json)));
-  if (customFieldsItem) {
-    customFieldsData = customFieldsItem.json.results || customFieldsItem.json || [];
-  }
-} catch (error) {
-  console.warn('Custom fields data not found, continuing with empty array');
-  customFieldsData = [];
-}
-
-// Safely extract document properties
-const documentText = (documentData.json.content || '').substring(0, 2000); // Limit content length
-const documentTitle = documentData.json.title || 'Untitled Document';
-const correspondent = documentData.json.correspondent || 'Unknown';
-const documentType = documentData.json.document_type || 'Unknown';
-const documentId = documentData.json.id;
-
-if (!documentId || documentId === 'unknown') {
-  console.warn('Document ID is missing or invalid, workflow may have limited functionality');
-}
-
-// Build comprehensive prompt
-const prompt = `
-AI document analyzer for Paperless-ngx. IMPORTANT: Return valid JSON ONLY.
-
-Document Information:
-- Title: ${documentTitle}
-- Current Type: ${documentType}
-- Current Correspondent: ${correspondent}
-- Content Preview: ${documentText}
-- Available Custom Fields: ${customFieldsData.length} fields
-
-INSTRUCTIONS:
-1. Analyze the document content thoroughly
-2. **CRITICAL**: Identify the CORRESPONDENT (sender/company/organization) - this is WHO sent or created the document
-   - Examples: "Amazon", "Magenta Telekom", "AMS", "Helvetia Insurance", "Microsoft"
-   - The correspondent is NOT the document type (Invoice, Letter, etc.)
-   - If you cannot determine the sender, use "Unknown" as correspondent name
-3. Identify the DOCUMENT TYPE (what kind of document it is)
-   - Examples: "Invoice", "Letter", "Contract", "Receipt", "Statement"
-4. Use available tools to get existing entities (document_types, custom_fields, tags)
-5. Prioritize using existing entities over creating new ones
-6. Return structured JSON with confidence scores
-7. Handle missing data gracefully
-
-OUTPUT REQUIREMENTS:
-Return a JSON object with this exact structure:
-{
-  "correspondent": {
-    "name": "Company or Organization Name",
-    "confidence": 0.85,
-    "note": "Explain how you identified the correspondent"
-  },
-  "document_analysis": {
-    "confidence": 0.85,
-    "category": "detected_category",
-    "summary": "brief_analysis_summary"
-  },
-  "document_type": {
-    "recommended_id": 123,
-    "recommended_name": "existing_type_name",
-    "confidence": 0.90,
-    "create_new": false,
-    "new_type_suggestion": null
-  },
-  "custom_fields": {
-    "field_updates": {
-      "123": "extracted_value_1",
-      "456": "extracted_value_2"
-    },
-    "confidence": 0.85,
-    "new_fields_needed": []
-  },
-  "tags": {
-    "existing_tag_names": ["tag1", "tag2"],
-    "new_tags_needed": [],
-    "confidence": 0.80
-  },
-  "processing_notes": "Explain decisions and any limitations"
-}
-
-EXAMPLES OF CORRECT CORRESPONDENT EXTRACTION:
-- Document from Amazon about a purchase → correspondent.name: "Amazon"
-- Invoice from Magenta Telekom → correspondent.name: "Magenta Telekom"
-- Letter from AMS (Arbeitsmarktservice) → correspondent.name: "AMS"
-- Insurance statement from Helvetia → correspondent.name: "Helvetia"
-- Receipt from a local shop "Tech Store" → correspondent.name: "Tech Store"
-
-IMPORTANT:
-- Use get_document_types, get_custom_fields, get_tags tools first
-- Prefer existing entities over creating new ones
-- Include confidence scores for all recommendations
-- Handle errors gracefully in your analysis
-- If you cannot analyze something, explain why in processing_notes
-- **Do NOT use document type as correspondent** (e.g., don't use "Invoice" as correspondent.name)
-- Return valid JSON only
-`;
-
-const result = {
-  ...(documentData.json || {}),
-  ai_prompt: prompt,
-  document_id: documentId,
-  custom_fields_available: customFieldsData.length,
-  processing_context: {
-    has_content: !!(documentData.json.content),
-    has_custom_fields: customFieldsData.length > 0,
-    document_valid: !!(documentId && documentId !== 'unknown')
-  }
-};
-
-console.log(`Prepared AI prompt for document ${documentId} with ${customFieldsData.length} custom fields available`);
-console.log('✅ Prompt includes correspondent extraction instructions');
-return { json: result };'''
-
-ai_prompt_node['parameters']['jsCode'] = new_ai_prompt_code
-print("[OK] Updated AI Prompt Preparation node code")
-
-# === FIND AND UPDATE CONSOLIDATED PROCESSOR NODE ===
-print("\n[STEP 2] Finding Consolidated Processor node...")
-
-consolidated_node = None
-for node in workflow['nodes']:
-    if node.get('name') == 'Consolidated Processor':
-        consolidated_node = node
-        print(f"[OK] Found Consolidated Processor node")
-        break
-
-if not consolidated_node:
-    print("[ERROR] Could not find Consolidated Processor node!")
-    sys.exit(1)
-
-old_code = consolidated_node['parameters']['jsCode']
-
-# Find and replace the correspondent extraction section
-# Look for the line: const correspondentName = processingData.document_analysis?.category || 'unknown';
-old_pattern = r"const correspondentName = processingData\.document_analysis\?\.category \|\| 'unknown';"
-
-new_correspondent_extraction = '''// ===== UPDATED CORRESPONDENT EXTRACTION =====
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Optional, Tuple
+
+from workflow_io import (
+    add_batch_arguments, dumps_workflow, load_node_code, load_workflow, run_file_batch,
+    write_patched,
+)
+
+INPUT_FILE = 'paperless_workflow-v14.1-http-nodes.json'
+OUTPUT_FILE = 'paperless_workflow-v14.1-correspondent-fix.json'
+
+# Correspondent extraction line in the Consolidated Processor code; a plain
+# substring, so no regex is needed to find it
+_CORRESPONDENT_LINE = "const correspondentName = processingData.document_analysis?.category || 'unknown';"
+# Fallback: any declaration of correspondentName from document_analysis
+_CORRESPONDENT_DECL = 'const correspondentName = processingData.document_analysis'
+# Logged only by the new extraction, so its presence means already patched
+_PATCHED_MARKER = '✅ Using AI-extracted correspondent'
+
+# Replacement for the correspondent extraction line
+NEW_CORRESPONDENT_EXTRACTION = '''// ===== UPDATED CORRESPONDENT EXTRACTION =====
   // Priority:
   // 1. Use AI-extracted correspondent.name if available and confidence > 0.6
   // 2. Fall back to document_analysis.category (old behavior)
@@ -220,61 +68,192 @@ new_correspondent_extraction = '''// ===== UPDATED CORRESPONDENT EXTRACTION ====
   }
 
   // Validate correspondent is not a document type
-  const commonDocTypes = ['invoice', 'letter', 'contract', 'receipt', 'statement', 'document'];
-  if (commonDocTypes.includes(correspondentName.toLowerCase())) {
+  const DOC_TYPES = new Set(['invoice', 'letter', 'contract', 'receipt', 'statement', 'document']);
+  if (DOC_TYPES.has(correspondentName.toLowerCase())) {
     console.error(`❌ INVALID CORRESPONDENT: "${correspondentName}" is a document type, not a sender!`);
     console.error('   Setting correspondent to "Unknown" - please fix AI extraction');
     correspondentName = 'Unknown';
   }'''
 
-if re.search(old_pattern, old_code):
-    new_code = re.sub(old_pattern, new_correspondent_extraction, old_code)
-    consolidated_node['parameters']['jsCode'] = new_code
-    print("[OK] Updated Consolidated Processor correspondent extraction")
-else:
+
+@lru_cache(maxsize=None)
+def ai_prompt_code(minify: bool = True) -> str:
+    """Updated AI Prompt Preparation code, kept in src/ and read on first use"""
+    return load_node_code('prepare_ai_prompt_node.js', minify=minify)
+
+
+def find_target_nodes(workflow: dict) -> Tuple[Optional[dict], Optional[dict]]:
+    """Return (AI prompt node, Consolidated Processor node), None if missing
+
+    Both are found in a single pass that stops once both are found.
+    """
+    ai_prompt_node = consolidated_node = None
+    for node in workflow['nodes']:
+        node_get = node.get
+        if consolidated_node is None and node_get('name') == 'Consolidated Processor':
+            consolidated_node = node
+        # Only Code nodes get their parameters and code looked up at all
+        if ai_prompt_node is None and node_get('type') == 'n8n-nodes-base.code':
+            # No throwaway {} / '' defaults for nodes without parameters or code
+            params = node_get('parameters')
+            code = params.get('jsCode') if params else None
+            # The rarer marker first, so most Code nodes fail on one scan
+            if code and 'OUTPUT REQUIREMENTS' in code and 'ai_prompt' in code:
+                ai_prompt_node = node
+        if ai_prompt_node is not None and consolidated_node is not None:
+            break
+    return ai_prompt_node, consolidated_node
+
+
+def patch_consolidated_code(code: str) -> Optional[str]:
+    """Return code with the new correspondent extraction, or None if not found"""
+    if _PATCHED_MARKER in code:
+        print("[OK] Consolidated Processor already has the new extraction, skipping")
+        return code
+
+    # Locate the line once and splice at that index (no second scan)
+    line_start = code.find(_CORRESPONDENT_LINE)
+    if line_start >= 0:
+        line_end = line_start + len(_CORRESPONDENT_LINE)
+        print("[OK] Updated Consolidated Processor correspondent extraction")
+        return code[:line_start] + NEW_CORRESPONDENT_EXTRACTION + code[line_end:]
+
     print("[WARNING] Could not find exact correspondent extraction pattern")
     print("Searching for alternative patterns...")
 
-    # Alternative pattern
-    if 'const correspondentName' in old_code:
-        # Find the section and replace it manually
-        lines = old_code.split('\n')
-        new_lines = []
-        skip_next = False
-
-        for i, line in enumerate(lines):
-            if 'const correspondentName = processingData.document_analysis' in line:
-                # Replace this line with new extraction code
-                new_lines.append(new_correspondent_extraction)
-                skip_next = False
-            elif skip_next:
-                skip_next = False
-            else:
-                new_lines.append(line)
-
-        new_code = '\n'.join(new_lines)
-        consolidated_node['parameters']['jsCode'] = new_code
-        print("[OK] Updated using alternative method")
-    else:
-        print("[ERROR] Could not find correspondent extraction code to replace!")
-        sys.exit(1)
+    # Alternative pattern: replace the whole line declaring correspondentName,
+    # bounded by the surrounding newlines, without splitting the code
+    decl_start = code.find(_CORRESPONDENT_DECL)
+    if decl_start < 0:
+        return None
+    line_start = code.rfind('\n', 0, decl_start) + 1
+    line_end = code.find('\n', decl_start)
+    if line_end < 0:
+        line_end = len(code)
+    print("[OK] Updated using alternative method")
+    return code[:line_start] + NEW_CORRESPONDENT_EXTRACTION + code[line_end:]
+
+
+def apply_fix(workflow: dict, minify: bool = True) -> Tuple[dict, dict]:
+    """Patch the AI prompt and Consolidated Processor nodes in place
+
+    The AI prompt code is minified unless minify=False. Returns the two patched nodes (AI prompt, Consolidated Processor).
+    Raises LookupError if either node or the correspondent extraction line
+    is missing; the workflow may then be partly patched.
+    """
+    ai_prompt_node, consolidated_node = find_target_nodes(workflow)
+
+    # === FIND AND UPDATE AI PROMPT PREPARATION NODE ===
+    print("\n[STEP 1] Finding AI Prompt Preparation node...")
+
+    if ai_prompt_node is None:
+        raise LookupError(
+            "Could not find AI Prompt Preparation node! Looking for a Code node "
+            "with 'ai_prompt' and 'OUTPUT REQUIREMENTS' in the code"
+        )
+    print(f"[OK] Found AI Prompt Preparation node: '{ai_prompt_node['name']}'")
+
+    ai_prompt_node['parameters']['jsCode'] = ai_prompt_code(minify)
+    print("[OK] Updated AI Prompt Preparation node code")
+
+    # === FIND AND UPDATE CONSOLIDATED PROCESSOR NODE ===
+    print("\n[STEP 2] Finding Consolidated Processor node...")
+
+    if consolidated_node is None:
+        raise LookupError("Could not find Consolidated Processor node!")
+    print(f"[OK] Found Consolidated Processor node")
+
+    new_code = patch_consolidated_code(consolidated_node['parameters']['jsCode'])
+    if new_code is None:
+        raise LookupError("Could not find correspondent extraction code to replace!")
+    consolidated_node['parameters']['jsCode'] = new_code
 
-# === SAVE UPDATED WORKFLOW ===
-output_file = 'paperless_workflow-v14.1-correspondent-fix.json'
-with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(workflow, f, indent=2, ensure_ascii=False)
-
-print(f"\n✅ SUCCESS! Saved to: {output_file}")
-print("\n[SUMMARY]")
-print("Updated 2 nodes:")
-print(f"  1. '{ai_prompt_node['name']}' - Added correspondent extraction to AI prompt")
-print(f"  2. '{consolidated_node['name']}' - Updated correspondent extraction logic")
-print("\n[NEXT STEPS]")
-print("1. Re-import the workflow in n8n:")
-print("   - Delete old 'Paperless AI Processing v14.1' workflow")
-print(f"   - Import: {output_file}")
-print("2. Test with a document that has a clear sender (e.g., Amazon invoice)")
-print("3. Check console logs for:")
-print("   ✅ 'Using AI-extracted correspondent: \"Amazon\"'")
-print("   ❌ NOT 'Falling back to document category as correspondent: \"Invoice\"'")
-print("4. Verify storage path includes company name, not document type")
+    return ai_prompt_node, consolidated_node
+
+
+def apply_fix_to_file(src, dst=None, pretty: bool = False) -> Tuple[str, str]:
+    """Patch the workflow at src and write it to dst
+
+    Without dst the file is patched in place, after the original is copied
+    to <src>.bak. Writes compact JSON with minified node code unless
+    pretty=True. Errors are reported here instead of raised, so one bad
+    file does not stop a batch.
+
+    Returns (status, detail): status is 'updated', 'unchanged' (dst already
+    held the result) or 'failed'; detail is the AI prompt node name, or the
+    error message when failed.
+    """
+    print(f"\n[FIXING] {src}")
+    src = Path(src)
+    dst = src if dst is None else Path(dst)
+    try:
+        # The whole workflow is loaded on purpose: both patched nodes are
+        # written back together with every other node, and at these sizes
+        # (~50 KB) a full parse and dump is several times faster than
+        # streaming nodes through ijson. Read-only single-node lookups use
+        # workflow_io.find_node() instead.
+        workflow = load_workflow(src)
+        ai_prompt_node, _ = apply_fix(workflow, minify=not pretty)
+        data = dumps_workflow(workflow, pretty=pretty)
+        if not write_patched(src, dst, data):
+            return 'unchanged', ai_prompt_node['name']
+    except (LookupError, OSError, ValueError) as e:
+        # LookupError also covers a KeyError from a malformed workflow, and
+        # ValueError a JSON decode error
+        print(f"[ERROR] {src}: {e}")
+        return 'failed', str(e)
+    return 'updated', ai_prompt_node['name']
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description="Add correspondent extraction to v14.1 workflows"
+    )
+    add_batch_arguments(parser, default=INPUT_FILE)
+    parser.add_argument(
+        '--pretty', action='store_true',
+        help="write 2-space indented JSON with the node code as written in src/"
+    )
+    return parser.parse_args()
+
+
+def main():
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8')
+
+    args = _parse_args()
+    if args.workflows:
+        worker = partial(apply_fix_to_file, pretty=args.pretty)
+        if not run_file_batch(worker, args.workflows, args.output_dir):
+            sys.exit(1)
+        return
+
+    output_file = Path(OUTPUT_FILE)
+    if args.output_dir is not None:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+        output_file = args.output_dir / OUTPUT_FILE
+    status, ai_prompt_name = apply_fix_to_file(INPUT_FILE, output_file, pretty=args.pretty)
+    if status == 'failed':
+        sys.exit(1)
+    if status == 'unchanged':
+        print(f"\n[SKIP] {output_file} is already up to date, nothing to write")
+        return
+
+    print(f"\n✅ SUCCESS! Saved to: {output_file}")
+    print("\n[SUMMARY]")
+    print("Updated 2 nodes:")
+    print(f"  1. '{ai_prompt_name}' - Added correspondent extraction to AI prompt")
+    print("  2. 'Consolidated Processor' - Updated correspondent extraction logic")
+    print("\n[NEXT STEPS]")
+    print("1. Re-import the workflow in n8n:")
+    print("   - Delete old 'Paperless AI Processing v14.1' workflow")
+    print(f"   - Import: {output_file}")
+    print("2. Test with a document that has a clear sender (e.g., Amazon invoice)")
+    print("3. Check console logs for:")
+    print("   ✅ 'Using AI-extracted correspondent: \"Amazon\"'")
+    print("   ❌ NOT 'Falling back to document category as correspondent: \"Invoice\"'")
+    print("4. Verify storage path includes company name, not document type")
+
+
+if __name__ == '__main__':
+    main()
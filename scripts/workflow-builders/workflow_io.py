@@ -0,0 +1,385 @@
+"""
+Shared workflow JSON I/O for the workflow builder scripts
+
+Uses orjson (C-accelerated) when it is installed and falls back to the
+standard library json module otherwise. Both paths write the same UTF-8
+JSON, either with a 2-space indent or compact (pretty=False), whichever
+backend is used.
+
+WorkflowPatcher loads a workflow once, applies any number of in-place
+patches (such as build_v14() or apply_fixes()) and dumps it once, so several
+builder steps can be chained without a JSON round-trip in between:
+
+    WorkflowPatcher(src).apply(build_v14).apply(apply_fixes).save(dst)
+
+find_node() fetches a single node and, when ijson is installed, stops
+parsing the file as soon as it is found.
+
+load_node_code() reads a Code node's JavaScript from the repo's src/
+directory and minifies it by dropping comments, blank lines and indentation
+(or with esbuild, as an explicit opt-in through WORKFLOW_MINIFIER=esbuild).
+
+run_batch() fans a per-file worker out over a process pool, since every
+workflow file in a migration batch can be patched independently.
+add_batch_arguments() and run_file_batch() give the builder scripts one
+shared batch CLI on top of it: workflow files or glob patterns, patched in
+place after a <file>.bak backup (write_patched()) or into --output-dir, with
+a per-file summary.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Source of the n8n Code node JavaScript
+SRC_DIR = Path(__file__).resolve().parent.parent.parent / 'src'
+
+
+def load_workflow(path) -> dict:
+    """Load a workflow JSON file"""
+    data = Path(path).read_bytes()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def find_node(path, name: str) -> Optional[dict]:
+    """Return the first node with this name in a workflow file, or None
+
+    With ijson the nodes are streamed one at a time and the rest of the file
+    is never decoded; otherwise the whole file is parsed and searched.
+    """
+    if ijson is not None:
+        with open(path, 'rb') as f:
+            nodes = ijson.items(f, 'nodes.item', use_float=True)
+            return next((node for node in nodes if node.get('name') == name), None)
+    nodes = load_workflow(path).get('nodes', [])
+    return next((node for node in nodes if node.get('name') == name), None)
+
+
+def dumps_workflow(workflow: dict, pretty: bool = True) -> bytes:
+    """Serialize a workflow to UTF-8 JSON, 2-space indented unless pretty=False"""
+    if orjson is not None:
+        return orjson.dumps(workflow, option=orjson.OPT_INDENT_2 if pretty else None)
+    if pretty:
+        return json.dumps(workflow, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(workflow, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dump_workflow(workflow: dict, path, pretty: bool = True) -> None:
+    """Write a workflow as JSON, 2-space indented unless pretty=False"""
+    Path(path).write_bytes(dumps_workflow(workflow, pretty))
+
+
+def is_up_to_date(path, data: bytes) -> bool:
+    """Return True if path already holds exactly these bytes"""
+    path = Path(path)
+    try:
+        if path.stat().st_size != len(data):
+            return False
+    except FileNotFoundError:
+        return False
+    return path.read_bytes() == data
+
+
+# Characters and keywords after which a '/' starts a regex literal rather
+# than a division
+_REGEX_PRECEDERS = frozenset('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = frozenset({
+    'return', 'typeof', 'case', 'in', 'of', 'new', 'delete', 'void', 'throw',
+    'else', 'do', 'instanceof', 'yield', 'await',
+})
+
+
+def _is_ident_char(c: str) -> bool:
+    return c.isalnum() or c in '_$'
+
+
+def _skip_regex(code: str, i: int) -> int:
+    """Return the index just past the regex literal (and flags) starting at i"""
+    in_class = False
+    i += 1
+    while i < len(code) and code[i] != '\n':
+        c = code[i]
+        if c == '\\':
+            i += 1
+        elif c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            while i < len(code) and _is_ident_char(code[i]):
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+def _js_line_states(code: str) -> List[str]:
+    """Return the lexer state at the start of every line of JS
+
+    'code', 'comment' (inside /* */) or 'literal' (inside a template literal,
+    or a string continued with a backslash). Strings, regex literals,
+    escapes and ${} nesting are tracked, so backticks inside them are not
+    mistaken for template delimiters.
+    """
+    states = ['code']
+    mode = 'code'   # 'code', 'comment', 'template', or the open quote
+    braces = []     # one entry per open '{': True if it is a template ${
+    prev = ''       # last significant character in code
+    word = ''       # identifier ending at prev, if any
+    i, n = 0, len(code)
+    while i < n:
+        c = code[i]
+        if c == '\n':
+            states.append('code' if mode == 'code' else 'comment' if mode == 'comment' else 'literal')
+            i += 1
+            continue
+        if mode == 'comment':
+            if code.startswith('*/', i):
+                mode = 'code'
+                i += 2
+            else:
+                i += 1
+            continue
+        if mode != 'code':
+            # Inside a string or template literal
+            if c == '\\':
+                if code.startswith('\n', i + 1):
+                    states.append('literal')
+                i += 2
+            elif c == mode:
+                mode = 'code'
+                prev, word = c, ''
+                i += 1
+            elif mode == '`' and code.startswith('${', i):
+                braces.append(True)
+                mode = 'code'
+                prev, word = '{', ''
+                i += 2
+            else:
+                i += 1
+            continue
+        if c in ' \t\r':
+            i += 1
+            continue
+        if code.startswith('//', i):
+            end = code.find('\n', i)
+            i = n if end < 0 else end
+            continue
+        if code.startswith('/*', i):
+            mode = 'comment'
+            i += 2
+            continue
+        if c in '\'"`':
+            mode = c
+            i += 1
+            continue
+        if c == '/' and (not prev or prev in _REGEX_PRECEDERS or word in _REGEX_KEYWORDS):
+            i = _skip_regex(code, i)
+            # A regex is an operand, so a '/' right after it is a division
+            prev, word = ')', ''
+            continue
+        if c == '{':
+            braces.append(False)
+        elif c == '}' and braces and braces.pop():
+            # End of a ${ } substitution: back inside the template literal
+            mode = '`'
+            i += 1
+            continue
+        if _is_ident_char(c):
+            word = (word if i and _is_ident_char(code[i - 1]) else '') + c
+        else:
+            word = ''
+        prev = c
+        i += 1
+    return states
+
+
+def _strip_js(code: str) -> str:
+    """Drop full-line comments, blank lines and indentation from JS
+
+    Lines keep their line breaks, so automatic semicolon insertion is not
+    affected. Lines that start inside a template literal (or a continued
+    string) are copied as-is, since their whitespace is part of the value.
+    """
+    lines = []
+    for line, state in zip(code.split('\n'), _js_line_states(code)):
+        if state == 'literal':
+            lines.append(line)
+            continue
+        if state == 'comment':
+            end = line.find('*/')
+            if end < 0:
+                continue
+            line = line[end + 2:]
+        stripped = line.strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        if stripped.startswith('/*'):
+            end = stripped.find('*/', 2)
+            if end < 0 or end + 2 == len(stripped):
+                # Comment-only line, or a comment continuing on the next lines
+                continue
+        lines.append(line.lstrip())
+    return '\n'.join(lines)
+
+
+def _esbuild_minify(path: Path) -> str:
+    esbuild = shutil.which('esbuild')
+    if not esbuild:
+        raise RuntimeError("WORKFLOW_MINIFIER=esbuild is set, but esbuild is not on PATH")
+    result = subprocess.run(
+        [esbuild, '--minify', str(path)],
+        capture_output=True, text=True, encoding='utf-8'
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"esbuild failed on {path.name}: {result.stderr.strip()}")
+    return result.stdout.rstrip('\n')
+
+
+def load_node_code(filename: str, minify: bool = True) -> str:
+    """Read a Code node's JavaScript from src/, minified unless minify=False
+
+    Minifying drops comments, blank lines and indentation, which gives the
+    same bytes on every machine. Set WORKFLOW_MINIFIER=esbuild to minify
+    with esbuild instead.
+    """
+    path = SRC_DIR / filename
+    if not minify:
+        return path.read_text(encoding='utf-8')
+    if os.environ.get('WORKFLOW_MINIFIER') == 'esbuild':
+        return _esbuild_minify(path)
+    return _strip_js(path.read_text(encoding='utf-8'))
+
+
+def run_batch(worker: Callable, paths: Iterable, *more: Iterable) -> List:
+    """Run worker(path) for every path, in parallel when there are several
+
+    Extra iterables supply further per-path arguments, as with map().
+    worker must be a module-level function so it can be pickled. Results
+    come back in the same order as paths.
+    """
+    args = [list(paths)] + [list(extra) for extra in more]
+    if len(args[0]) <= 1:
+        # Not worth starting a pool for a single file
+        return list(map(worker, *args))
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(worker, *args))
+
+
+def expand_paths(patterns: Iterable[str]) -> List[Path]:
+    """Expand glob patterns, keeping a pattern that matches nothing as-is"""
+    paths = []
+    for pattern in patterns:
+        paths.extend(Path(path) for path in sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+
+def write_patched(src, dst, data: bytes) -> bool:
+    """Write a patched workflow to dst, backing up src first if dst is src
+
+    The original is copied to <src>.bak before an in-place write. Returns
+    False, writing nothing, if dst already holds exactly these bytes.
+    """
+    src, dst = Path(src), Path(dst)
+    if is_up_to_date(dst, data):
+        return False
+    if dst == src:
+        shutil.copy2(src, src.with_name(src.name + '.bak'))
+    dst.write_bytes(data)
+    return True
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser, default: str) -> None:
+    """Add the shared batch arguments (workflow patterns, --output-dir)"""
+    parser.add_argument(
+        'workflows', nargs='*',
+        help=f"workflow files or glob patterns to patch (default: {default})"
+    )
+    parser.add_argument(
+        '--output-dir', type=Path,
+        help="write patched workflows here instead of in place (with a .bak backup)"
+    )
+
+
+def run_file_batch(worker: Callable, patterns: Iterable[str], output_dir=None) -> bool:
+    """Run worker(src, dst) on every matching workflow and print a summary
+
+    dst is None for an in-place patch. worker must be picklable and return
+    (status, detail): status is 'updated', 'unchanged' or 'failed', with
+    the error message as detail when failed. Returns False if any file is
+    missing or failed.
+    """
+    paths = expand_paths(patterns)
+    missing = [path for path in paths if not path.exists()]
+    if missing:
+        for path in missing:
+            print(f"[ERROR] Workflow not found at {path}")
+        return False
+
+    if output_dir is None:
+        dsts = [None] * len(paths)
+    else:
+        dsts = [output_dir / path.name for path in paths]
+        if len(set(dsts)) < len(dsts):
+            print(f"[ERROR] Several workflows share a file name, so they cannot all go to {output_dir}")
+            return False
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Each file is independent, so patch them in parallel
+    results = run_batch(worker, paths, dsts)
+    print()
+    failed = 0
+    for path, dst, (status, detail) in zip(paths, dsts, results):
+        target = path if dst is None else dst
+        if status == 'failed':
+            failed += 1
+            print(f"[ERROR] Failed: {path} ({detail})")
+        elif status == 'updated':
+            print(f"[OK] Updated: {target}")
+        else:
+            print(f"[SKIP] Already fixed: {target}")
+    if failed:
+        print(f"\n[ERROR] {failed} of {len(paths)} workflows could not be fixed")
+        return False
+    return True
+
+
+class WorkflowPatcher:
+    """Load a workflow once, apply patches in place, dump once"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.workflow = load_workflow(self.path)
+
+    def apply(self, patch: Callable[[dict], dict]) -> 'WorkflowPatcher':
+        """Apply a patch that mutates the workflow in place; chainable"""
+        if patch(self.workflow) is not self.workflow:
+            raise ValueError(f"{patch.__name__} must patch the workflow in place")
+        return self
+
+    def dumps(self) -> bytes:
+        """Serialize the patched workflow"""
+        return dumps_workflow(self.workflow)
+
+    def save(self, path=None) -> None:
+        """Write the patched workflow (back to the source path by default)"""
+        Path(path or self.path).write_bytes(self.dumps())
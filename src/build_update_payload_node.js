@@ -0,0 +1,42 @@
+/**
+ * Build Update Payload Node - v14.1
+ * Collects custom fields, correspondent, storage path and document type
+ * into the Paperless document update payload
+ *
+ * Embedded by scripts/workflow-builders/enhance_workflow.py
+ */
+
+console.log('=== BUILD UPDATE PAYLOAD ===');
+const data = $input.first().json;
+
+const payload = {};
+// Set by every branch that adds a field, instead of counting keys afterwards
+let hasUpdates = false;
+
+if (data.update_payload && data.update_payload.custom_fields) {
+  payload.custom_fields = data.update_payload.custom_fields;
+  hasUpdates = true;
+  console.log('Custom fields: ' + payload.custom_fields.length);
+}
+
+if (data.correspondent_id) {
+  payload.correspondent = data.correspondent_id;
+  hasUpdates = true;
+  console.log('Correspondent ID: ' + data.correspondent_id);
+}
+
+if (data.storage_path_id) {
+  payload.storage_path = data.storage_path_id;
+  hasUpdates = true;
+  console.log('Storage Path ID: ' + data.storage_path_id);
+}
+
+if (data.update_payload && data.update_payload.document_type) {
+  payload.document_type = data.update_payload.document_type;
+  hasUpdates = true;
+  console.log('Document Type ID: ' + payload.document_type);
+}
+
+console.log('Has updates: ' + hasUpdates);
+
+return {json: {document_id: data.document_id, update_payload: payload, has_updates: hasUpdates, processing_summary: data.processing_summary || {}}};
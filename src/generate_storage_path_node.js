@@ -0,0 +1,22 @@
+/**
+ * Generate Storage Path Node - v14.1
+ * Builds the storage path template and name from category and correspondent
+ *
+ * Embedded by scripts/workflow-builders/enhance_workflow.py
+ */
+
+// Slug regexes, defined once
+const SLUG_RE = /[^a-z0-9]+/g;
+const TRIM_DASHES_RE = /^-+|-+$/g;
+
+const data = $input.first().json;
+const category = data.storage_category || 'reference-documents';
+const correspondent = data.correspondent_name || 'Unknown';
+
+const correspondentSlug = correspondent.toLowerCase().replace(SLUG_RE, '-').replace(TRIM_DASHES_RE, '');
+const pathTemplate = category + '/' + correspondentSlug + '/{created_year}-{created_month}-{created_day}-{title}';
+const pathName = category + ' - ' + correspondent;
+
+console.log('Storage Path: ' + pathTemplate);
+
+return {json: {...data, storage_path_template: pathTemplate, storage_path_name: pathName}};
@@ -0,0 +1,44 @@
+/**
+ * Get Correspondent ID Node - v14.1
+ * Resolves the correspondent ID from "Check Correspondent Exists" (match)
+ * or "Create Correspondent" (new), failing loudly on HTTP errors
+ *
+ * Embedded by scripts/workflow-builders/enhance_workflow.py
+ */
+
+const data = $('Consolidated Processor').first().json;
+const checkResult = $('Check Correspondent Exists').first().json;
+const createResult = $input.first().json;
+
+// CHECK FOR HTTP ERROR from Create Correspondent
+if (createResult && (createResult.error || createResult.statusCode >= 400)) {
+  console.error('HTTP ERROR from Create Correspondent:');
+  console.error('  Status: ' + (createResult.statusCode || 'unknown'));
+  console.error('  Error: ' + (createResult.error || 'unknown'));
+  console.error('  Message: ' + (createResult.message || 'unknown'));
+  console.error('  Response body: ' + JSON.stringify(createResult, null, 2));
+  throw new Error('Create Correspondent HTTP request failed: ' + (createResult.message || createResult.error || 'Unknown error'));
+}
+
+let correspondentId = null;
+let action = 'unknown';
+
+if (checkResult && checkResult.count > 0) {
+  correspondentId = checkResult.results[0].id;
+  action = 'matched';
+  console.log('Matched correspondent ID: ' + correspondentId);
+} else if (createResult && createResult.id) {
+  correspondentId = createResult.id;
+  action = 'created';
+  console.log('Created correspondent ID: ' + correspondentId);
+}
+
+if (!correspondentId) {
+  console.error('ERROR: No correspondent ID found!');
+  console.error('Check result count: ' + (checkResult ? checkResult.count : 'null'));
+  console.error('Create result has id: ' + !!(createResult && createResult.id));
+  console.error('Create result full object: ' + JSON.stringify(createResult, null, 2));
+  throw new Error('Failed to get correspondent ID');
+}
+
+return {json: {...data, correspondent_id: correspondentId, correspondent_action: action}};
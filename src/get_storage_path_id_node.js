@@ -0,0 +1,56 @@
+/**
+ * Get Storage Path ID Node - v14.1
+ * Resolves the storage path ID from "Match Storage Path" (existing)
+ * or "Create Storage Path" (new), failing loudly on HTTP errors
+ *
+ * Embedded by scripts/workflow-builders/enhance_workflow.py
+ */
+
+// Extract Storage Path ID from either existing or newly created
+console.log('=== GET STORAGE PATH ID ===');
+
+// Always get base data from Match Storage Path node
+const matchResult = $('Match Storage Path').first().json;
+const createResult = $input.first().json;
+
+// CHECK FOR HTTP ERROR from Create Storage Path
+if (createResult && (createResult.error || createResult.statusCode >= 400)) {
+  console.error('HTTP ERROR from Create Storage Path:');
+  console.error('  Status: ' + (createResult.statusCode || 'unknown'));
+  console.error('  Error: ' + (createResult.error || 'unknown'));
+  console.error('  Message: ' + (createResult.message || 'unknown'));
+  console.error('  Response body: ' + JSON.stringify(createResult, null, 2));
+  throw new Error('Create Storage Path HTTP request failed: ' + (createResult.message || createResult.error || 'Unknown error'));
+}
+
+let storagePathId = null;
+let source = 'unknown';
+
+// Check if storage path already existed (from Match Storage Path)
+if (matchResult.storage_path_id) {
+  storagePathId = matchResult.storage_path_id;
+  source = 'existing';
+  console.log('Using existing storage path ID: ' + storagePathId);
+} else {
+  // Storage path was just created - get from current input
+  if (createResult && createResult.id) {
+    storagePathId = createResult.id;
+    source = 'created';
+    console.log('Created new storage path ID: ' + storagePathId);
+    console.log('  Name: ' + createResult.name);
+    console.log('  Path: ' + createResult.path);
+  }
+}
+
+// ERROR HANDLING: Stop if no storage path ID
+if (!storagePathId) {
+  console.error('ERROR: No storage path ID found!');
+  console.error('Match result has storage_path_id: ' + !!matchResult.storage_path_id);
+  console.error('Input has id: ' + !!(createResult && createResult.id));
+  console.error('Create result full object: ' + JSON.stringify(createResult, null, 2));
+  throw new Error('Failed to get storage path ID - check Create Storage Path node');
+}
+
+console.log('Storage Path ID: ' + storagePathId + ' (source: ' + source + ')');
+
+return {json: {...matchResult, storage_path_id: storagePathId, storage_path_source: source}};
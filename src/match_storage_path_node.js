@@ -0,0 +1,32 @@
+/**
+ * Match Storage Path Node - v14.1
+ * Looks up an existing storage path by name or template
+ *
+ * Embedded by scripts/workflow-builders/enhance_workflow.py
+ */
+
+const allPaths = $input.first().json;
+const data = $('Generate Storage Path').first().json;
+const targetTemplate = data.storage_path_template;
+const targetName = data.storage_path_name;
+
+console.log('Looking for storage path:');
+console.log('  Name: ' + targetName);
+console.log('  Template: ' + targetTemplate);
+
+// Check both name and path to avoid unique constraint errors
+const existing = allPaths.results.find(function(sp) {
+  return sp.name === targetName || sp.path === targetTemplate;
+});
+
+if (existing) {
+  console.log('Found existing storage path:');
+  console.log('  ID: ' + existing.id);
+  console.log('  Name: ' + existing.name);
+  console.log('  Path: ' + existing.path);
+  console.log('  Match type: ' + (existing.name === targetName ? 'by name' : 'by path'));
+  return {json: {...data, storage_path_id: existing.id, storage_path_exists: true}};
+} else {
+  console.log('No matching storage path found, will create new one');
+  return {json: {...data, storage_path_id: null, storage_path_exists: false}};
+}
@@ -0,0 +1,147 @@
+/**
+ * AI Prompt Preparation Node - v14.1
+ * Builds the AI classification prompt, asking the model to extract the
+ * correspondent (sender) separately from the document type
+ *
+ * Embedded by scripts/workflow-builders/fix_correspondent_extraction.py
+ */
+
+// Enhanced AI Prompt with Error Handling + CORRESPONDENT EXTRACTION
+const inputItems = $input.all();
+let documentData = null;
+let customFieldsData = [];
+
+// Find document data with fallbacks
+try {
+  documentData = inputItems.find(item => item.json && (item.json.content || item.json.title));
+  if (!documentData) {
+    throw new Error('No document data found in inputs');
+  }
+} catch (error) {
+  console.error('Document data error:', error.message);
+  // Create minimal fallback structure
+  documentData = {
+    json: {
+      id: 'unknown',
+      title: 'Unknown Document',
+      content: '',
+      correspondent: 'Unknown',
+      document_type: 'Unknown'
+    }
+  };
+}
+
+// Find custom fields data with fallbacks
+try {
+  const customFieldsItem = inputItems.find(item => item.json && (Array.isArray(item.json.results) || Array.isArray(item.json)));
+  if (customFieldsItem) {
+    customFieldsData = customFieldsItem.json.results || customFieldsItem.json || [];
+  }
+} catch (error) {
+  console.warn('Custom fields data not found, continuing with empty array');
+  customFieldsData = [];
+}
+
+// Safely extract document properties
+const documentText = (documentData.json.content || '').substring(0, 2000); // Limit content length
+const documentTitle = documentData.json.title || 'Untitled Document';
+const correspondent = documentData.json.correspondent || 'Unknown';
+const documentType = documentData.json.document_type || 'Unknown';
+const documentId = documentData.json.id;
+
+if (!documentId || documentId === 'unknown') {
+  console.warn('Document ID is missing or invalid, workflow may have limited functionality');
+}
+
+// Build comprehensive prompt
+const prompt = `
+AI document analyzer for Paperless-ngx. IMPORTANT: Return valid JSON ONLY.
+
+Document Information:
+- Title: ${documentTitle}
+- Current Type: ${documentType}
+- Current Correspondent: ${correspondent}
+- Content Preview: ${documentText}
+- Available Custom Fields: ${customFieldsData.length} fields
+
+INSTRUCTIONS:
+1. Analyze the document content thoroughly
+2. **CRITICAL**: Identify the CORRESPONDENT (sender/company/organization) - this is WHO sent or created the document
+   - Examples: "Amazon", "Magenta Telekom", "AMS", "Helvetia Insurance", "Microsoft"
+   - The correspondent is NOT the document type (Invoice, Letter, etc.)
+   - If you cannot determine the sender, use "Unknown" as correspondent name
+3. Identify the DOCUMENT TYPE (what kind of document it is)
+   - Examples: "Invoice", "Letter", "Contract", "Receipt", "Statement"
+4. Use available tools to get existing entities (document_types, custom_fields, tags)
+5. Prioritize using existing entities over creating new ones
+6. Return structured JSON with confidence scores
+7. Handle missing data gracefully
+
+OUTPUT REQUIREMENTS:
+Return a JSON object with this exact structure:
+{
+  "correspondent": {
+    "name": "Company or Organization Name",
+    "confidence": 0.85,
+    "note": "Explain how you identified the correspondent"
+  },
+  "document_analysis": {
+    "confidence": 0.85,
+    "category": "detected_category",
+    "summary": "brief_analysis_summary"
+  },
+  "document_type": {
+    "recommended_id": 123,
+    "recommended_name": "existing_type_name",
+    "confidence": 0.90,
+    "create_new": false,
+    "new_type_suggestion": null
+  },
+  "custom_fields": {
+    "field_updates": {
+      "123": "extracted_value_1",
+      "456": "extracted_value_2"
+    },
+    "confidence": 0.85,
+    "new_fields_needed": []
+  },
+  "tags": {
+    "existing_tag_names": ["tag1", "tag2"],
+    "new_tags_needed": [],
+    "confidence": 0.80
+  },
+  "processing_notes": "Explain decisions and any limitations"
+}
+
+EXAMPLES OF CORRECT CORRESPONDENT EXTRACTION:
+- Document from Amazon about a purchase → correspondent.name: "Amazon"
+- Invoice from Magenta Telekom → correspondent.name: "Magenta Telekom"
+- Letter from AMS (Arbeitsmarktservice) → correspondent.name: "AMS"
+- Insurance statement from Helvetia → correspondent.name: "Helvetia"
+- Receipt from a local shop "Tech Store" → correspondent.name: "Tech Store"
+
+IMPORTANT:
+- Use get_document_types, get_custom_fields, get_tags tools first
+- Prefer existing entities over creating new ones
+- Include confidence scores for all recommendations
+- Handle errors gracefully in your analysis
+- If you cannot analyze something, explain why in processing_notes
+- **Do NOT use document type as correspondent** (e.g., don't use "Invoice" as correspondent.name)
+- Return valid JSON only
+`;
+
+const result = {
+  ...(documentData.json || {}),
+  ai_prompt: prompt,
+  document_id: documentId,
+  custom_fields_available: customFieldsData.length,
+  processing_context: {
+    has_content: !!(documentData.json.content),
+    has_custom_fields: customFieldsData.length > 0,
+    document_valid: !!(documentId && documentId !== 'unknown')
+  }
+};
+
+console.log(`Prepared AI prompt for document ${documentId} with ${customFieldsData.length} custom fields available`);
+console.log('✅ Prompt includes correspondent extraction instructions');
+return { json: result };
@@ -0,0 +1,141 @@
+/**
+ * Process AI Results Node - v14.1
+ * Parses and sanitizes the AI classification response, including the
+ * extracted correspondent
+ *
+ * Embedded by scripts/workflow-builders/fix_both_nodes_final.py
+ */
+
+// Consolidated AI Results Processor - Handles all processing in one node
+console.log('=== CONSOLIDATED AI RESULTS PROCESSOR ===');
+const startTime = Date.now();
+
+// Markdown code fence regexes, defined once (only needed when the response
+// holds no JSON object)
+const FENCE_JSON_RE = /```json\n?/g;
+const FENCE_RE = /```\n?/g;
+
+let aiResults = {};
+let processingErrors = [];
+
+// Read once here and reused for the document id and the AI output
+const inputJson = $input.first()?.json || null;
+let documentId = null;
+let aiResponseText = null;
+
+if (inputJson) {
+  console.log('Input structure - Keys:', Object.keys(inputJson));
+
+  // Capture document_id from input (single extraction)
+  documentId = inputJson.document_id || null;
+  console.log('Document ID:', documentId);
+
+  // Extract AI response from "output" field
+  aiResponseText = inputJson.output || inputJson;
+  console.log('Content type:', typeof aiResponseText);
+}
+
+if (aiResponseText !== null && typeof aiResponseText === 'object') {
+  // Fast path: upstream already parsed the AI response
+  aiResults = aiResponseText;
+} else {
+  try {
+    if (!inputJson) {
+      throw new Error('No input data received');
+    }
+
+    // Parse the AI response
+    let parsedResults;
+
+    if (typeof aiResponseText === 'string') {
+      console.log('Raw AI response (first 200 chars):', aiResponseText.substring(0, 200));
+
+      // Extract JSON from text - find everything between first { and last }.
+      // Markdown code fences sit outside the braces, so they need no
+      // separate stripping pass.
+      let jsonText;
+      const firstBrace = aiResponseText.indexOf('{');
+      const lastBrace = aiResponseText.lastIndexOf('}');
+
+      if (firstBrace !== -1 && lastBrace > firstBrace) {
+        jsonText = aiResponseText.slice(firstBrace, lastBrace + 1);
+        console.log('✅ Extracted JSON from text (first 100 chars):', jsonText.substring(0, 100));
+      } else {
+        // No object to slice out (e.g. a fenced array): remove the fences
+        jsonText = aiResponseText
+          .replace(FENCE_JSON_RE, '')
+          .replace(FENCE_RE, '')
+          .trim();
+      }
+
+      parsedResults = JSON.parse(jsonText);
+      console.log('✅ Parsed successfully');
+    }
+
+    aiResults = parsedResults;
+
+  } catch (error) {
+    console.error('Error:', error.message);
+    processingErrors.push(`Parsing error: ${error.message}`);
+    aiResults = {
+      correspondent: { name: 'Unknown', confidence: 0, note: '' },
+      document_analysis: { confidence: 0.1, category: 'unknown', summary: 'Parsing failed' },
+      document_type: { recommended_id: null, confidence: 0, create_new: false },
+      custom_fields: { field_updates: {}, confidence: 0 },
+      tags: { existing_tag_names: [], new_tags_needed: [], confidence: 0 }
+    };
+  }
+}
+
+// Sanitization schema: [section, field, type, fallback], in output order.
+// Falsy values fall back to the default, as the old `||` chains did.
+const SANITIZE_SCHEMA = [
+  ['correspondent', 'name', 'string', 'Unknown'],
+  ['correspondent', 'confidence', 'number', 0],
+  ['correspondent', 'note', 'string', ''],
+  ['document_analysis', 'confidence', 'number', 0.5],
+  ['document_analysis', 'category', 'string', 'unknown'],
+  ['document_analysis', 'summary', 'string', 'Analysis completed'],
+  ['document_type', 'recommended_id', 'value', null],
+  ['document_type', 'recommended_name', 'string', ''],
+  ['document_type', 'confidence', 'number', 0],
+  ['document_type', 'create_new', 'boolean', false],
+  ['document_type', 'new_type_suggestion', 'value', null],
+  ['custom_fields', 'field_updates', 'value', {}],
+  ['custom_fields', 'confidence', 'number', 0],
+  ['custom_fields', 'new_fields_needed', 'value', []],
+  ['tags', 'existing_tag_names', 'value', []],
+  ['tags', 'new_tags_needed', 'value', []],
+  ['tags', 'confidence', 'number', 0]
+];
+
+// Build final sanitized structure, reading each AI section once
+const sanitizedResults = { document_id: documentId };
+let sectionName = null;
+let source;
+let target;
+for (const [section, field, type, fallback] of SANITIZE_SCHEMA) {
+  if (section !== sectionName) {
+    sectionName = section;
+    source = aiResults[section];
+    target = sanitizedResults[section] = {};
+  }
+  const value = source?.[field];
+  target[field] =
+    type === 'string' ? String(value || fallback) :
+    type === 'number' ? Number(value) || fallback :
+    type === 'boolean' ? Boolean(value) :
+    value || fallback;
+}
+
+sanitizedResults.processing_notes = String(aiResults.processing_notes || 'Processing completed');
+sanitizedResults.processing_errors = processingErrors;
+sanitizedResults.processing_timestamp = new Date().toISOString();
+sanitizedResults.processing_duration_ms = Date.now() - startTime;
+
+console.log('=== PARSING COMPLETE ===');
+console.log(`Document ID: ${documentId}`);
+console.log(`Correspondent: ${sanitizedResults.correspondent.name} (confidence: ${sanitizedResults.correspondent.confidence})`);
+console.log(`Duration: ${sanitizedResults.processing_duration_ms}ms`);
+
+return { json: sanitizedResults };